@@ -2,6 +2,7 @@ import logging
 import asyncio
 import os
 import sys
+from types import MappingProxyType
 
 # Add project root to path
 sys.path.append(os.getcwd())
@@ -15,6 +16,7 @@ from telegram.ext import (
     filters,
 )
 import config
+from core import event_loop
 from core.agent import Agent
 from core.ui.telegram_ui import TelegramUIManager
 
@@ -24,8 +26,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize Agent
-agent = Agent()
+# The Agent loads every tool module, so it is created once on first use
+# rather than as a side effect of importing this file
+_agent = None
+
+def get_agent() -> Agent:
+    global _agent
+    if _agent is None:
+        _agent = Agent()
+    return _agent
+
+def get_tool_context(chat_id, context: ContextTypes.DEFAULT_TYPE):
+    # Built per message: three slots are cheaper than a per-chat cache that grows with every chat served.
+    # Read-only, so a tool can't change what the next tool sees.
+    return MappingProxyType({
+        "bot": context.bot,
+        "chat_id": chat_id,
+        "job_queue": context.job_queue
+    })
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await context.bot.send_message(
@@ -35,7 +53,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def clear_memory(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = str(update.effective_chat.id)
-    await agent.episodic_memory.clear(chat_id)
+    await get_agent().episodic_memory.clear(chat_id)
     await context.bot.send_message(chat_id=chat_id, text="Memory cleared.")
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -51,41 +69,34 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Prepare context for tools
-    tool_context = {
-        "bot": context.bot,
-        "chat_id": chat_id,
-        "job_queue": context.job_queue
-    }
+    tool_context = get_tool_context(chat_id, context)
 
     final_response = ""
 
+    # Status edits are coalesced by the UI manager (latest text wins); send_final_response stops its editor
     try:
-        async for update_data in agent.run(user_input, chat_id, tool_context):
+        async for update_data in get_agent().run(user_input, chat_id, tool_context):
             status = update_data.get("status")
 
             if status == "thinking":
-                msg = f"Thinking: {update_data.get('message', '...')}"
-                await ui.update_status(chat_id, status_msg.message_id, msg)
+                await ui.update_status(chat_id, status_msg.message_id, f"Thinking: {update_data.get('message', '...')}")
 
             elif status == "tool_use":
                 tool = update_data.get("tool")
-                msg = f"Executing: {tool}..."
-                await ui.update_status(chat_id, status_msg.message_id, msg)
+                await ui.update_status(chat_id, status_msg.message_id, f"Executing: {tool}...")
 
             elif status == "plan_created":
                 plan = update_data.get("plan")
                 steps = len(plan)
-                msg = f"Plan created ({steps} steps). Executing..."
-                await ui.update_status(chat_id, status_msg.message_id, msg)
+                # Sent once the plan has run (tasks execute while it streams)
+                await ui.update_status(chat_id, status_msg.message_id, f"Plan executed ({steps} steps).")
 
             elif status == "executing":
-                msg = f"Executing plan..."
-                await ui.update_status(chat_id, status_msg.message_id, msg)
+                await ui.update_status(chat_id, status_msg.message_id, update_data.get("message", "Executing plan..."))
 
             elif status == "final_stream":
-                content = update_data.get("content")
-                final_response += content
-                # Update UI periodically with accumulated content + cursor
+                # Agent sends the accumulated text so far, not just the delta
+                final_response = update_data.get("content")
                 await ui.update_status(chat_id, status_msg.message_id, final_response + " ▌")
 
             elif status == "final":
@@ -100,19 +111,41 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await ui.send_final_response(chat_id, status_msg.message_id, "Error: No response generated.")
 
     except Exception as e:
-        logger.error(f"Error handling message: {e}")
+        logger.error("Error handling message: %s", e, exc_info=True)
         # Try to update message with error
         try:
             await ui.send_final_response(chat_id, status_msg.message_id, f"Error: {str(e)}")
         except:
             await context.bot.send_message(chat_id=chat_id, text=f"Error: {str(e)}")
 
+async def shutdown(application):
+    # Flush memory writes still running in the background
+    if _agent is not None:
+        await _agent.shutdown()
+
 if __name__ == "__main__":
     if not hasattr(config, "TELEGRAM_BOT_TOKEN") or not config.TELEGRAM_BOT_TOKEN:
         print("Error: TELEGRAM_BOT_TOKEN not found in config.py")
         sys.exit(1)
 
-    application = ApplicationBuilder().token(config.TELEGRAM_BOT_TOKEN).build()
+    event_loop.install()
+
+    # Load modules before polling starts so the first message isn't delayed
+    get_agent()
+
+    application = (
+        ApplicationBuilder()
+        .token(config.TELEGRAM_BOT_TOKEN)
+        # PTB's default pool of 1 connection can't keep up with status edits, final sends and jobs at once
+        .connection_pool_size(64)
+        .pool_timeout(30)
+        .connect_timeout(10)
+        .read_timeout(30)
+        .get_updates_connection_pool_size(2)
+        .get_updates_pool_timeout(30)
+        .post_shutdown(shutdown)
+        .build()
+    )
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("clear", clear_memory))
@@ -1,7 +1,11 @@
 import asyncio
+import functools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, AsyncGenerator
 
+import config
+
 from core.llm import LLMService
 from core.module_manager import ModuleManager
 from core.memory.vector_memory import VectorMemory
@@ -9,8 +13,34 @@ from core.memory.episodic_memory import EpisodicMemory
 from core.decision import DecisionLayer
 from core.planner import Planner
 from core.executor import Executor
+from core.task_graph import TaskGraph
+
+# final_stream events are flushed once this many new characters or seconds accumulate
+STREAM_FLUSH_CHARS = 80
+STREAM_FLUSH_INTERVAL = 0.5
 
-import os
+# Rough size estimate used to bound the history sent to the LLM
+CHARS_PER_TOKEN = 4
+
+# Tool output beyond this is cut before it is shown or sent to the LLM (large scrapes, file reads)
+OBSERVATION_MAX_CHARS = 16000
+
+@functools.lru_cache(maxsize=1)
+def _load_system_prompt() -> str:
+    """
+    Reads the system prompt once per process.
+    Call _load_system_prompt.cache_clear() to pick up edits without a restart.
+    """
+    for path in ("system_prompt.txt", "system_prompt_structured.txt"):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            logging.getLogger("Agent").error("Error loading system prompt: %s", e)
+            break
+    return "You are a helpful AI assistant."
 
 class Agent:
     def __init__(self):
@@ -18,26 +48,31 @@ class Agent:
         self.module_manager = ModuleManager()
         self.module_manager.load_modules()
 
-        self.vector_memory = VectorMemory()
+        self._tools = None
+        self._tool_names = set()
+
+        # Sync tools get their own bounded pool instead of the loop's default executor;
+        # the semaphore caps queued + running calls so bursts wait instead of piling up
+        workers = getattr(config, "SYNC_TOOL_WORKERS", 8)
+        self._sync_tool_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tool")
+        self._sync_tool_slots = asyncio.Semaphore(workers * 4)
+
         self.episodic_memory = EpisodicMemory()
 
         self.decision_layer = DecisionLayer(self.llm)
         self.planner = Planner(self.llm)
-        self.executor = Executor(self.module_manager)
+        self.executor = Executor(self.module_manager, tool_pool=self._sync_tool_pool)
 
         self.logger = logging.getLogger("Agent")
 
-        # Load system prompt
-        self.system_prompt = "You are a helpful AI assistant."
-        try:
-            if os.path.exists("system_prompt.txt"):
-                with open("system_prompt.txt", "r", encoding="utf-8") as f:
-                    self.system_prompt = f.read()
-            elif os.path.exists("system_prompt_structured.txt"):
-                with open("system_prompt_structured.txt", "r", encoding="utf-8") as f:
-                    self.system_prompt = f.read()
-        except Exception as e:
-            self.logger.error(f"Error loading system prompt: {e}")
+        self.system_prompt = _load_system_prompt()
+        self._system_message = {"role": "system", "content": self.system_prompt}
+        self.history_token_budget = getattr(config, "HISTORY_TOKEN_BUDGET", 6000)
+
+    @functools.cached_property
+    def vector_memory(self):
+        # Not used on the per-message path yet; load the store only when something asks for it
+        return VectorMemory()
 
     async def run(self, user_input: str, chat_id: str, context: Dict[str, Any] = None) -> AsyncGenerator[Dict[str, Any], None]:
         """
@@ -47,49 +82,46 @@ class Agent:
         if context is None:
             context = {}
 
-        # 1. Load History
-        history = await self.episodic_memory.get_history(chat_id)
+        # 1. Load History (only the recent part that fits the prompt budget)
+        history = self._window_history(await self.episodic_memory.get_history(chat_id))
 
         # 2. Get Tool Definitions
-        tools = self.module_manager.get_definitions()
+        tools = self._get_tools()
 
         yield {"status": "thinking", "message": "Analyzing request..."}
 
         # 3. Decision Layer
         try:
-            decision = await self.decision_layer.decide(user_input, history, tools)
-            self.logger.info(f"Decision for {chat_id}: {decision}")
+            decision = self.decision_layer.fast_classify(user_input, self._tool_names)
+            if decision is None:
+                decision = await self.decision_layer.decide(user_input, history, tools)
+            self.logger.info("Decision for %s: %s", chat_id, decision)
         except Exception as e:
-            self.logger.error(f"Decision failed: {e}")
+            self.logger.error("Decision failed: %s", e, exc_info=True)
             decision = {"decision": "RESPOND_DIRECTLY"}
 
         action = decision.get("decision")
 
+        if action == "USE_TOOL" and decision.get("tool_name") not in self._tool_names:
+            # Hallucinated tool name: answer directly instead of dispatching a call that can only fail
+            self.logger.warning("Unknown tool '%s' chosen for %s, responding directly", decision.get("tool_name"), chat_id)
+            action = "RESPOND_DIRECTLY"
+
         final_response = ""
 
         if action == "RESPOND_DIRECTLY":
             yield {"status": "thinking", "message": "Drafting response..."}
-            # Generate response using LLM
-            messages = list(history)
-            messages.append({"role": "user", "content": user_input})
-
-            # Simple prompt wrapper?
-            # Or just pass messages directly
-            # We might want to inject system prompt here if not present
-            if not messages or messages[0]["role"] != "system":
-                 messages.insert(0, {"role": "system", "content": self.system_prompt})
-
-            stream = await self.llm.generate(messages, stream=True, provider="deepseek")
-
-            async for chunk in stream:
-                if isinstance(chunk, str):
-                    yield {"status": "final_stream", "content": chunk}
-                    final_response += chunk
-                elif hasattr(chunk, 'choices') and chunk.choices:
-                    delta = chunk.choices[0].delta
-                    if delta.content:
-                        yield {"status": "final_stream", "content": delta.content}
-                        final_response += delta.content
+            # Generate response using LLM.
+            # Build the request in one allocation; the shared system message keeps the prefix stable for prompt caching.
+            user_message = {"role": "user", "content": user_input}
+            if history and history[0]["role"] == "system":
+                messages = [*history, user_message]
+            else:
+                messages = [self._system_message, *history, user_message]
+
+            async for event in self._stream_final(messages):
+                final_response = event["content"]
+                yield event
 
         elif action == "USE_TOOL":
             tool_name = decision.get("tool_name")
@@ -99,28 +131,24 @@ class Agent:
             try:
                 # Execute tool
                 result = await self._execute_tool_safe(tool_name, tool_args, context)
+                # Tool output can be large: stringify and bound it once, reuse below
+                result_text = self._observation_text(result)
 
-                yield {"status": "observation", "result": str(result)}
+                yield {"status": "observation", "result": result_text}
 
                 # Generate final response with tool output
                 yield {"status": "thinking", "message": "Synthesizing answer..."}
 
-                messages = list(history)
-                messages.append({"role": "user", "content": user_input})
-                messages.append({"role": "assistant", "content": f"I will use {tool_name}."})
-                messages.append({"role": "tool", "content": str(result), "name": tool_name}) # OpenAI format roughly
-
-                stream = await self.llm.generate(messages, stream=True, provider="deepseek")
+                messages = [
+                    *history,
+                    {"role": "user", "content": user_input},
+                    {"role": "assistant", "content": f"I will use {tool_name}."},
+                    {"role": "tool", "content": result_text, "name": tool_name}, # OpenAI format roughly
+                ]
 
-                async for chunk in stream:
-                    if isinstance(chunk, str):
-                        yield {"status": "final_stream", "content": chunk}
-                        final_response += chunk
-                    elif hasattr(chunk, 'choices') and chunk.choices:
-                        delta = chunk.choices[0].delta
-                        if delta.content:
-                            yield {"status": "final_stream", "content": delta.content}
-                            final_response += delta.content
+                async for event in self._stream_final(messages):
+                    final_response = event["content"]
+                    yield event
 
             except Exception as e:
                 final_response = f"Error executing tool {tool_name}: {e}"
@@ -130,34 +158,29 @@ class Agent:
             yield {"status": "thinking", "message": "Creating plan..."}
 
             try:
-                plan = await self.planner.create_plan(user_input, history, tools)
+                # Tasks start as soon as the planner has streamed them, while the rest of the plan is still arriving
+                yield {"status": "executing", "message": "Planning and executing..."}
+                plan = TaskGraph()
+                tasks = self.planner.stream_plan(user_input, history, tools)
+                execution_result = await self.executor.execute_graph(plan, context, incoming=tasks)
                 yield {"status": "plan_created", "plan": [t.to_dict() for t in plan.tasks.values()]}
+                result_text = self._observation_text(execution_result)
 
-                # Execute Plan
-                yield {"status": "executing", "message": "Executing plan..."}
-                execution_result = await self.executor.execute_graph(plan, context)
-
-                yield {"status": "observation", "result": str(execution_result)}
+                yield {"status": "observation", "result": result_text}
 
                 # Generate final response
                 yield {"status": "thinking", "message": "Finalizing..."}
 
-                messages = list(history)
-                messages.append({"role": "user", "content": user_input})
-                messages.append({"role": "assistant", "content": "I have executed the plan."})
-                messages.append({"role": "system", "content": f"Plan Execution Result: {execution_result}"})
-
-                stream = await self.llm.generate(messages, stream=True, provider="deepseek")
+                messages = [
+                    *history,
+                    {"role": "user", "content": user_input},
+                    {"role": "assistant", "content": "I have executed the plan."},
+                    {"role": "system", "content": f"Plan Execution Result: {result_text}"},
+                ]
 
-                async for chunk in stream:
-                    if isinstance(chunk, str):
-                        yield {"status": "final_stream", "content": chunk}
-                        final_response += chunk
-                    elif hasattr(chunk, 'choices') and chunk.choices:
-                        delta = chunk.choices[0].delta
-                        if delta.content:
-                            yield {"status": "final_stream", "content": delta.content}
-                            final_response += delta.content
+                async for event in self._stream_final(messages):
+                    final_response = event["content"]
+                    yield event
 
             except Exception as e:
                 final_response = f"Planning failed: {e}"
@@ -167,24 +190,101 @@ class Agent:
             final_response = "I am not sure what to do."
             yield {"status": "final", "content": final_response}
 
-        # 4. Save Memory
+        # 4. Save Memory (only updates memory; the disk write happens in EpisodicMemory's background writer)
         if final_response:
-            await self.episodic_memory.add_message(chat_id, "user", user_input)
-            await self.episodic_memory.add_message(chat_id, "assistant", final_response)
+            await self._save_turn(chat_id, user_input, final_response)
 
             # Optional: Add to vector memory if significant?
             # self.vector_memory.add(f"User: {user_input}\nAssistant: {final_response}")
 
         yield {"status": "final", "content": final_response}
 
+    async def shutdown(self):
+        """Flushes memory writes and releases the tool pool, module sessions and LLM connections. Call before the event loop stops."""
+        await self.episodic_memory.close()
+        await self.module_manager.close()
+        await self.llm.aclose()
+        self._sync_tool_pool.shutdown(wait=False)
+
+    async def _save_turn(self, chat_id, user_input, final_response):
+        # EpisodicMemory's writer persists this and retries failed disk writes
+        messages = [("user", user_input), ("assistant", final_response)]
+        try:
+            await self.episodic_memory.add_messages(chat_id, messages)
+        except Exception as e:
+            self.logger.error("Failed to save history for %s: %s", chat_id, e, exc_info=True)
+
+    def _window_history(self, history):
+        """Returns the most recent messages that fit in history_token_budget."""
+        budget = self.history_token_budget * CHARS_PER_TOKEN
+        used = 0
+        start = len(history)
+        while start > 0:
+            used += len(history[start - 1].get("content") or "")
+            if used > budget:
+                break
+            start -= 1
+        return history[start:] if start else history
+
+    @staticmethod
+    def _observation_text(result):
+        """Returns the tool result as text, cut to OBSERVATION_MAX_CHARS."""
+        text = result if isinstance(result, str) else str(result)
+        if len(text) > OBSERVATION_MAX_CHARS:
+            text = text[:OBSERVATION_MAX_CHARS - 3] + "..."
+        return text
+
+    def _get_tools(self):
+        """Returns the tool definitions, refreshing the name set when the registry rebuilt them."""
+        tools = self.module_manager.get_definitions()
+        if tools is not self._tools:
+            self._tools = tools
+            self._tool_names = {t["function"]["name"] for t in tools}
+        return tools
+
+    async def _stream_final(self, messages):
+        """
+        Streams the final answer from the LLM.
+        Yields 'final_stream' events in batches; 'content' always holds the full text so far.
+        """
+        stream = await self.llm.generate(messages, stream=True, provider="deepseek")
+
+        loop = asyncio.get_running_loop()
+        text = ""
+        # Deltas since the last event; joined once per flush rather than concatenated per token
+        pending = []
+        pending_len = 0
+        last_emit = loop.time()
+
+        async for chunk in stream:
+            pending.append(chunk)
+            pending_len += len(chunk)
+
+            if pending_len >= STREAM_FLUSH_CHARS or loop.time() - last_emit >= STREAM_FLUSH_INTERVAL:
+                delta = "".join(pending)
+                text += delta
+                pending.clear()
+                pending_len = 0
+                yield {"status": "final_stream", "content": text, "delta": delta}
+                last_emit = loop.time()
+
+        if pending:
+            delta = "".join(pending)
+            yield {"status": "final_stream", "content": text + delta, "delta": delta}
+
     async def _execute_tool_safe(self, tool_name, args, context):
         """Executes a tool handling async/sync and errors."""
-        is_async = self.module_manager.tool_metadata.get(tool_name, {}).get("is_async", False)
+        meta = self.module_manager.tool_metadata.get(tool_name, {})
+        is_async = meta.get("is_async", False)
 
         if is_async:
-            result = await self.module_manager.execute(tool_name, tool_context=context, **args)
-            if asyncio.iscoroutine(result):
-                result = await result
-            return result
-        else:
-            return await asyncio.to_thread(self.module_manager.execute, tool_name, tool_context=context, **args)
+            return await self.module_manager.execute_async(tool_name, tool_context=context, **args)
+
+        if meta.get("inline"):
+            # Cheaper to call on the loop than to hand to a worker thread
+            return self.module_manager.execute(tool_name, tool_context=context, **args)
+
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self.module_manager.execute, tool_name, tool_context=context, **args)
+        async with self._sync_tool_slots:
+            return await loop.run_in_executor(self._sync_tool_pool, call)
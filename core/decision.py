@@ -1,24 +1,37 @@
+import re
 import json
-from typing import Dict, Any, List
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 
-class DecisionLayer:
-    def __init__(self, llm_service):
-        self.llm = llm_service
+from core import json_utils
 
-    async def decide(self, user_input: str, history: List[Dict], available_tools: List[Dict]) -> Dict[str, Any]:
-        """
-        Decides the next action: RESPOND_DIRECTLY, USE_TOOL, or CREATE_PLAN.
-        Returns a dict with 'action' and 'details'.
-        """
+# Exact-match decision cache, keyed by the input and the history the LLM would see with it.
+# Very short inputs ("yes", "more") depend on the conversation too much to be worth caching.
+DECISION_CACHE_SIZE = 256
+DECISION_CACHE_MIN_WORDS = 3
+
+# JSON object inside an optional ```json ... ``` fence
+_FENCE_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.S)
 
-        # Construct a specialized prompt for decision making
-        tool_names = [t["function"]["name"] for t in available_tools]
+# Whole-message patterns that are decided without the LLM; anything longer goes through decide().
+# Acknowledgements like "ok" are left out: they usually confirm an action the assistant just proposed.
+_GREETING_RE = re.compile(
+    r"^\s*(hi|hello|hey|thanks|thank you|привет|здравствуй(те)?|добрый (день|вечер|утро)|спасибо)"
+    r"[\s!.,)]*$",
+    re.I,
+)
+_TIME_RE = re.compile(
+    r"^\s*(what time is it|what's the time|который час|сколько (сейчас )?времени)[\s?!.]*$",
+    re.I,
+)
 
-        system_prompt = f"""
+# Formatted with str.format, hence the doubled braces around the JSON example
+DECISION_PROMPT_TEMPLATE = """
 You are the Decision Layer of an AI agent.
 Analyze the user request and decide the best course of action.
 
-AVAILABLE TOOLS: {', '.join(tool_names)}
+AVAILABLE TOOLS: {tool_names}
 
 DECISION OPTIONS:
 1. RESPOND_DIRECTLY: If the user greets, asks a simple question (identity, capabilities), or if you can answer from your knowledge/memory WITHOUT tools.
@@ -36,14 +49,67 @@ OUTPUT FORMAT (JSON ONLY):
 Minimze steps. If you can answer directly, do so.
 """
 
+class DecisionLayer:
+    def __init__(self, llm_service):
+        self.llm = llm_service
+        self._prompt_cache = {}  # sorted tool names -> formatted system prompt
+        self._decision_cache = OrderedDict()  # (normalized input, history digest, tool names) -> decision, LRU order
+
+    def _get_system_prompt(self, tools_key: Tuple[str, ...]) -> str:
+        """Returns the decision prompt for this tool set, formatting it only the first time."""
+        prompt = self._prompt_cache.get(tools_key)
+        if prompt is None:
+            prompt = DECISION_PROMPT_TEMPLATE.format(tool_names=", ".join(tools_key))
+            self._prompt_cache[tools_key] = prompt
+        return prompt
+
+    def _decision_cache_key(self, user_input: str, context: List[Dict], tools_key: Tuple[str, ...]) -> Optional[tuple]:
+        words = user_input.lower().split()
+        if len(words) < DECISION_CACHE_MIN_WORDS:
+            return None
+        # "Do the same for tomorrow" means something else after every turn
+        context_digest = hashlib.blake2b(json_utils.dumps_bytes(context), digest_size=16).digest()
+        return (" ".join(words), context_digest, tools_key)
+
+    def _remember_decision(self, key: tuple, decision: Dict[str, Any]):
+        self._decision_cache[key] = decision
+        self._decision_cache.move_to_end(key)
+        if len(self._decision_cache) > DECISION_CACHE_SIZE:
+            self._decision_cache.popitem(last=False)
+
+    def fast_classify(self, user_input: str, tool_names) -> Optional[Dict[str, Any]]:
+        """Returns a decision for trivial messages (greetings, time questions), or None to ask the LLM."""
+        if _GREETING_RE.match(user_input):
+            return {"decision": "RESPOND_DIRECTLY", "reasoning": "Greeting"}
+        if "get_current_time" in tool_names and _TIME_RE.match(user_input):
+            return {"decision": "USE_TOOL", "tool_name": "get_current_time", "tool_args": {}, "reasoning": "Time question"}
+        return None
+
+    async def decide(self, user_input: str, history: List[Dict], available_tools: List[Dict]) -> Dict[str, Any]:
+        """
+        Decides the next action: RESPOND_DIRECTLY, USE_TOOL, or CREATE_PLAN.
+        Returns a dict with 'action' and 'details'.
+        """
+
+        tools_key = tuple(sorted(t["function"]["name"] for t in available_tools))
+        # Limited history context (last 3 messages)
+        context = history[-3:]
+
+        # Same request in the same context against the same tools: reuse the earlier decision and skip the LLM round-trip
+        cache_key = self._decision_cache_key(user_input, context, tools_key)
+        if cache_key is not None and cache_key in self._decision_cache:
+            self._decision_cache.move_to_end(cache_key)
+            return dict(self._decision_cache[cache_key])
+
+        system_prompt = self._get_system_prompt(tools_key)
+
+        # Built in one allocation
         messages = [
             {"role": "system", "content": system_prompt},
+            *context,
+            {"role": "user", "content": user_input},
         ]
 
-        # Add limited history context (last 3 messages)
-        messages.extend(history[-3:])
-        messages.append({"role": "user", "content": user_input})
-
         try:
             # Force JSON mode if supported or just ask for JSON
             response = await self.llm.generate(
@@ -57,15 +123,18 @@ Minimze steps. If you can answer directly, do so.
                 return {"decision": "RESPOND_DIRECTLY", "reasoning": f"LLM Error: {response}"}
 
             content = response.content
-            # Clean up markdown code blocks if present
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+            # Strip a markdown code fence if present
+            match = _FENCE_RE.search(content)
+            payload = match.group(1) if match else content.strip()
 
-            decision_data = json.loads(content)
+            decision_data = json_utils.loads(payload)
+            if cache_key is not None and isinstance(decision_data, dict):
+                self._remember_decision(cache_key, dict(decision_data))
             return decision_data
 
+        except json.JSONDecodeError as e:
+            print(f"Decision error: invalid JSON ({e}). Raw response: {content[:500]!r}")
+            return {"decision": "RESPOND_DIRECTLY", "reasoning": "Unparseable decision"}
         except Exception as e:
             # Fallback
             print(f"Decision error: {e}")
@@ -0,0 +1,23 @@
+import sys
+import asyncio
+
+# uvloop is optional; it cuts per-await overhead on the streaming path. It has no Windows build.
+uvloop = None
+if sys.platform != "win32":
+    try:
+        import uvloop
+    except ImportError:
+        pass
+
+
+def new_event_loop():
+    """Creates a uvloop loop when available, otherwise a stdlib one."""
+    if uvloop is not None:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+def install():
+    """Makes loops created through the asyncio policy (asyncio.run, PTB's run_polling) use uvloop when available."""
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
@@ -1,69 +1,114 @@
 import asyncio
+import functools
 from core.task_graph import TaskGraph, TaskStatus
 from core.module_manager import ModuleManager
 
+# Tasks of one plan that may run at the same time; the rest wait for a slot
+MAX_CONCURRENT_TASKS = 8
+
 class Executor:
-    def __init__(self, module_manager: ModuleManager):
+    def __init__(self, module_manager: ModuleManager, tool_pool=None, max_concurrency=MAX_CONCURRENT_TASKS):
         self.module_manager = module_manager
+        self.max_concurrency = max_concurrency
+        # Sync tools run here; None falls back to the loop's default executor
+        self.tool_pool = tool_pool
 
-    async def execute_graph(self, graph: TaskGraph, context: dict = None):
+    async def execute_graph(self, graph: TaskGraph, context: dict = None, incoming=None):
         """
         Executes the task graph until completion or failure.
         Returns the result of the last completed task.
+        incoming is an optional async generator of further Tasks (e.g. Planner.stream_plan);
+        each is added to the graph as it arrives, so execution overlaps with planning.
         """
         if not context:
             context = {}
 
+        slots = asyncio.Semaphore(self.max_concurrency)
         results = {} # task_id -> result
+        running = {} # asyncio.Task -> Task, in launch order
+        feed = asyncio.ensure_future(incoming.__anext__()) if incoming is not None else None
 
-        while not graph.is_complete():
-            ready_tasks = graph.get_ready_tasks()
-
-            if not ready_tasks:
-                # Deadlock or finished?
-                if all(t.status in [TaskStatus.COMPLETED, TaskStatus.FAILED] for t in graph.tasks.values()):
-                    break
-                else:
-                    return "Error: Plan stalled (dependency loop or failure)."
-
-            # Execute ready tasks (could be parallelized)
-            for task in ready_tasks:
+        while True:
+            # Start everything whose dependencies are met; ready tasks are independent of each other
+            for task in graph.get_ready_tasks():
                 task.status = TaskStatus.RUNNING
+                running[asyncio.create_task(self._run_task(task, context, slots))] = task
 
-                # Resolve arguments (replace placeholders if any)
-                # Simple logic: If an argument is a string starting with '$', look up dependency result
-                # Ideally, the planner should handle this via specific syntax, but let's keep it simple.
-                # Or, we just pass the previous results in context?
+            if not running and feed is None:
+                break
 
-                # For now, pass all previous results in a special arg if tool supports it?
-                # Better: Update args with dependency results if explicitly referenced?
-
-                # Simple implementation: Just execute.
-
-                print(f"Executing task {task.id}: {task.tool} args={task.args}")
+            # Resume as soon as any task finishes (or a new one arrives) so dependents start without waiting for siblings
+            waiting = set(running)
+            if feed is not None:
+                waiting.add(feed)
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
 
+            failure = None
+            if feed in done:
                 try:
-                    # Check if async
-                    is_async = self.module_manager.tool_metadata.get(task.tool, {}).get("is_async", False)
-
-                    if is_async:
-                        result = await self.module_manager.execute(task.tool, tool_context=context, **task.args)
-                        if asyncio.iscoroutine(result):
-                            result = await result
-                    else:
-                        result = await asyncio.to_thread(self.module_manager.execute, task.tool, tool_context=context, **task.args)
+                    graph.add_task(feed.result())
+                    feed = asyncio.ensure_future(incoming.__anext__())
+                except StopAsyncIteration:
+                    feed = None
+                except Exception as e:
+                    feed = None
+                    failure = f"Planning failed: {e}"
 
+            for future in [f for f in running if f in done]:
+                task = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    graph.mark_failed(task.id, str(error))
+                    if failure is None:
+                        failure = f"Task {task.id} ({task.tool}) failed: {error}"
+                else:
+                    result = future.result()
                     graph.mark_completed(task.id, result)
                     results[task.id] = result
 
-                except Exception as e:
-                    graph.mark_failed(task.id, str(e))
-                    return f"Task {task.id} ({task.tool}) failed: {e}"
+            if failure:
+                for future in running:
+                    future.cancel()
+                await asyncio.gather(*running, return_exceptions=True)
+                if feed is not None:
+                    feed.cancel()
+                    await asyncio.gather(feed, return_exceptions=True)
+                    await incoming.aclose()
+                return failure
+
+        if not graph.is_complete():
+            return "Error: Plan stalled (dependency loop or failure)."
 
         # Return the result of the last task (or all results?)
         # Usually the last added task is the goal.
-        # Let's find the task with no dependents? or simply the last one by ID logic?
-        # We'll return the last executed result.
-        if results:
-            return list(results.values())[-1]
+        # Tasks finish in any order, so pick by plan order rather than completion order.
+        for task_id in reversed(list(graph.tasks)):
+            if task_id in results:
+                return results[task_id]
         return "No tasks executed."
+
+    async def _run_task(self, task, context, slots):
+        """Runs a single task's tool once a slot is free. Exceptions propagate to execute_graph."""
+        async with slots:
+            return await self._call_tool(task, context)
+
+    async def _call_tool(self, task, context):
+        # Resolve arguments (replace placeholders if any)
+        # Simple logic: If an argument is a string starting with '$', look up dependency result
+        # Ideally, the planner should handle this via specific syntax, but let's keep it simple.
+        # For now: Just execute.
+        print(f"Executing task {task.id}: {task.tool} args={task.args}")
+
+        meta = self.module_manager.tool_metadata.get(task.tool, {})
+
+        if meta.get("is_async", False):
+            result = await self.module_manager.execute_async(task.tool, tool_context=context, **task.args)
+        elif meta.get("inline"):
+            # Cheaper to call on the loop than to hand to a worker thread
+            result = self.module_manager.execute(task.tool, tool_context=context, **task.args)
+        else:
+            loop = asyncio.get_running_loop()
+            call = functools.partial(self.module_manager.execute, task.tool, tool_context=context, **task.args)
+            result = await loop.run_in_executor(self.tool_pool, call)
+
+        return result
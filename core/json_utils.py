@@ -0,0 +1,29 @@
+import json
+
+# orjson is several times faster than the stdlib; fall back cleanly when it isn't installed.
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can keep catching the latter.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data):
+    """Parses JSON from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, indent=False) -> str:
+    """Serializes to a str without ASCII escaping; indent=True pretty-prints with 2 spaces."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None)
+
+
+def dumps_bytes(obj) -> bytes:
+    """Serializes compactly to UTF-8 bytes, for writing straight to a binary file."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
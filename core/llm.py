@@ -1,22 +1,49 @@
 import os
+import asyncio
+import httpx
 from openai import AsyncOpenAI
 from typing import AsyncGenerator, Union, List, Dict, Any
 import config
 
+# Streamed deltas are handed on in batches of up to this many chunks, or after this many seconds
+STREAM_BATCH_CHUNKS = 8
+STREAM_BATCH_SECONDS = 0.02
+
+# Transient 429/5xx responses are retried (with backoff) inside the client before surfacing as errors
+LLM_MAX_RETRIES = 3
+
+def _http_client() -> httpx.AsyncClient:
+    """Connection pool for one provider, sized for planner/executor fan-out rather than httpx defaults."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=256, max_keepalive_connections=64),
+        timeout=httpx.Timeout(60.0, connect=5.0),
+    )
+
 class LLMService:
+    # One instance is shared by the agent, decision layer and planner, so every call
+    # reuses the clients' keep-alive connections instead of paying a new TLS handshake.
     def __init__(self):
         # Initialize Groq client
         self.groq_client = AsyncOpenAI(
             api_key=config.GROQ_API_KEY,
-            base_url="https://api.groq.com/openai/v1"
+            base_url="https://api.groq.com/openai/v1",
+            max_retries=LLM_MAX_RETRIES,
+            http_client=_http_client()
         )
 
         # Initialize DeepSeek client
         self.deepseek_client = AsyncOpenAI(
             api_key=config.DEEPSEEK_API_KEY,
-            base_url="https://api.deepseek.com"
+            base_url="https://api.deepseek.com",
+            max_retries=LLM_MAX_RETRIES,
+            http_client=_http_client()
         )
 
+    async def aclose(self):
+        """Closes the providers' HTTP connection pools (the clients own the httpx clients passed to them)."""
+        await self.groq_client.close()
+        await self.deepseek_client.close()
+
     async def generate(
         self,
         messages: List[Dict[str, str]],
@@ -28,7 +55,7 @@ class LLMService:
     ) -> Union[Any, AsyncGenerator[Any, None]]:
         """
         Generates response via Groq or DeepSeek API.
-        Returns message object (non-stream) or async generator of chunks (stream).
+        Returns message object (non-stream) or async generator of text deltas (stream).
         """
         try:
             if model is None or model == "default":
@@ -53,10 +80,28 @@ class LLMService:
                     tool_choice=tool_choice
                 )
 
-                # Wrap generator to yield raw chunks
-                async def stream_generator() -> AsyncGenerator[Any, None]:
+                # Reduce provider chunks to their text deltas so consumers never inspect chunk objects.
+                # Token-sized deltas are joined into small batches to cut the per-yield overhead downstream.
+                async def stream_generator() -> AsyncGenerator[str, None]:
+                    loop = asyncio.get_running_loop()
+                    batch = []
+                    deadline = None
                     async for chunk in response:
-                        yield chunk
+                        choices = chunk.choices
+                        if not choices:
+                            continue
+                        content = choices[0].delta.content
+                        if not content:
+                            continue
+                        batch.append(content)
+                        if deadline is None:
+                            deadline = loop.time() + STREAM_BATCH_SECONDS
+                        if len(batch) >= STREAM_BATCH_CHUNKS or loop.time() >= deadline:
+                            yield "".join(batch)
+                            batch.clear()
+                            deadline = None
+                    if batch:
+                        yield "".join(batch)
 
                 return stream_generator()
 
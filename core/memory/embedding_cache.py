@@ -0,0 +1,105 @@
+import os
+import time
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class EmbeddingCache:
+    """
+    LRU cache of text -> embedding, keyed by the SHA-256 of the text.
+    Optionally persisted to disk with pickle so repeated texts survive restarts.
+    Thread-safe: memory tools call into it from worker threads.
+    """
+
+    def __init__(self, max_size=10000, ttl=None, persist_path=None, save_interval=60):
+        self.max_size = max_size
+        self.ttl = ttl  # seconds; None keeps entries until evicted
+        self.persist_path = persist_path
+        self.save_interval = save_interval  # seconds between saves triggered by maybe_save()
+        self._entries = OrderedDict()  # digest -> (stored_at, embedding)
+        self._lock = threading.Lock()
+        # Held for a whole save: concurrent saves would share the tmp file
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._load()
+
+    def _load(self):
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "rb") as f:
+                self._entries = pickle.load(f)
+        except Exception as e:
+            print(f"Warning: could not load embedding cache: {e}")
+            self._entries = OrderedDict()
+
+    def save(self):
+        """Writes the cache to persist_path if it changed since the last save."""
+        if not self.persist_path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data = pickle.dumps(self._entries, protocol=pickle.HIGHEST_PROTOCOL)
+                self._dirty = False
+            try:
+                os.makedirs(os.path.dirname(self.persist_path) or ".", exist_ok=True)
+                tmp_path = self.persist_path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self.persist_path)
+            except Exception:
+                self._dirty = True
+                raise
+            self._saved_at = time.monotonic()
+
+    def maybe_save(self):
+        """Saves only if the last save is at least save_interval old, so frequent writers don't re-pickle the whole cache."""
+        if self._dirty and time.monotonic() - self._saved_at >= self.save_interval:
+            self.save()
+
+    @staticmethod
+    def _key(text):
+        return hashlib.sha256(text.encode("utf-8")).digest()
+
+    def get(self, text):
+        key = self._key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, embedding = entry
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return embedding
+
+    def put(self, text, embedding):
+        key = self._key(text)
+        with self._lock:
+            self._entries[key] = (time.time(), embedding)
+            self._entries.move_to_end(key)
+            self._dirty = True
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, texts, embed_fn):
+        """
+        Returns embeddings for texts, in order.
+        Only the cache misses are passed to embed_fn, in a single batch.
+        """
+        results = [self.get(text) for text in texts]
+        missing = [i for i, embedding in enumerate(results) if embedding is None]
+
+        if missing:
+            computed = embed_fn([texts[i] for i in missing])
+            for i, embedding in zip(missing, computed):
+                results[i] = embedding
+                self.put(texts[i], embedding)
+
+        return results
@@ -1,28 +1,150 @@
-import json
 import os
 import asyncio
+import logging
+
+from core import json_utils
+
+logger = logging.getLogger("EpisodicMemory")
+
+# Mutations go to an append-only log; the full snapshot is rewritten only after this many of them
+SNAPSHOT_EVERY = 500
+
+# Seconds the background writer waits after a mutation, so a burst is written in one go
+WRITE_COALESCE_DELAY = 0.05
+
+# After a failed write the writer retries with exponential backoff, starting here and capped at the max
+WRITE_RETRY_DELAY = 0.5
+WRITE_RETRY_MAX_DELAY = 30
 
 class EpisodicMemory:
     def __init__(self, storage_file="data/sessions.json"):
         self.storage_file = storage_file
+        self.log_file = storage_file + ".log"
         self.sessions = {}
         self.lock = asyncio.Lock()
+        self._writes_since_snapshot = 0
+        # Log lines not yet on disk, written off the event loop by one background task.
+        # Created on first write: the memory may be built before the event loop runs.
+        self._pending = []
+        self._dirty = None
+        self._stop = None
+        self._writer_task = None
         self._load()
 
     def _load(self):
         if os.path.exists(self.storage_file):
             try:
-                with open(self.storage_file, "r", encoding="utf-8") as f:
-                    self.sessions = json.load(f)
+                with open(self.storage_file, "rb") as f:
+                    self.sessions = json_utils.loads(f.read())
             except:
                 self.sessions = {}
         else:
             self.sessions = {}
 
+        # Replay mutations made since the last snapshot
+        if os.path.exists(self.log_file):
+            with open(self.log_file, "rb") as f:
+                data = f.read()
+            # Every entry ends with a newline; anything after the last one is a torn write from a crash.
+            # Cut it off, or the next append would land on the same line and be unreadable too.
+            complete = data.rfind(b"\n") + 1
+            if complete < len(data):
+                with open(self.log_file, "r+b") as f:
+                    f.truncate(complete)
+            for line in data[:complete].splitlines():
+                try:
+                    entry = json_utils.loads(line)
+                except ValueError:
+                    continue
+                self._apply(entry)
+                self._writes_since_snapshot += 1
+
+    def _apply(self, entry):
+        # Entries are idempotent, so replaying a log already folded into the snapshot is harmless
+        history = self.sessions.setdefault(entry["cid"], [])
+        del history[entry["start"]:]
+        history.extend(entry["messages"])
+
     def _save(self):
         os.makedirs(os.path.dirname(self.storage_file), exist_ok=True)
-        with open(self.storage_file, "w", encoding="utf-8") as f:
-            json.dump(self.sessions, f, ensure_ascii=False, indent=2)
+        tmp_file = self.storage_file + ".tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(json_utils.dumps_bytes(self.sessions))
+        os.replace(tmp_file, self.storage_file)
+        # The snapshot now holds everything in the log
+        if os.path.exists(self.log_file):
+            os.remove(self.log_file)
+        self._writes_since_snapshot = 0
+
+    def _append_log(self, lines):
+        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+        with open(self.log_file, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    def _log(self, cid, start):
+        """Records that sessions[cid] was replaced from index start onwards. Written in the background."""
+        entry = {"cid": cid, "start": start, "messages": self.sessions[cid][start:]}
+        self._pending.append(json_utils.dumps(entry) + "\n")
+
+        if self._writer_task is None or self._writer_task.done():
+            self._dirty = asyncio.Event()
+            self._stop = asyncio.Event()
+            self._writer_task = asyncio.create_task(self._writer())
+        self._dirty.set()
+
+    async def _writer(self):
+        failures = 0
+        while not self._stop.is_set():
+            await self._dirty.wait()
+            self._dirty.clear()
+            if not self._stop.is_set():
+                await asyncio.sleep(WRITE_COALESCE_DELAY)
+            if await self._write_pending():
+                failures = 0
+            elif not self._stop.is_set():
+                # The lines are back in _pending; try again after a backoff that close() cuts short
+                failures += 1
+                delay = min(WRITE_RETRY_DELAY * 2 ** (failures - 1), WRITE_RETRY_MAX_DELAY)
+                try:
+                    await asyncio.wait_for(self._stop.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._dirty.set()
+
+    async def _write_pending(self):
+        """Writes pending log lines. On failure they are kept for the next attempt; returns False."""
+        # Holding the lock keeps the sessions unchanged while a snapshot serializes them in a thread
+        async with self.lock:
+            if not self._pending:
+                return True
+            lines, self._pending = self._pending, []
+            try:
+                if self._writes_since_snapshot + len(lines) >= SNAPSHOT_EVERY:
+                    await asyncio.to_thread(self._save)  # the snapshot already contains these lines
+                else:
+                    await asyncio.to_thread(self._append_log, lines)
+                    self._writes_since_snapshot += len(lines)
+            except Exception as e:
+                self._pending[:0] = lines
+                logger.error("Failed to write session history (%d entries pending): %s", len(self._pending), e)
+                return False
+            return True
+
+    async def flush(self):
+        """Writes pending mutations to disk now. Returns False if the write failed; they stay pending."""
+        return await self._write_pending()
+
+    async def close(self):
+        """
+        Flushes pending mutations and stops the background writer. Call before the event loop stops.
+        If the final write fails it is logged, not raised, so shutdown can continue.
+        """
+        if self._writer_task is not None:
+            self._stop.set()
+            self._dirty.set()
+            await self._writer_task
+            self._writer_task = None
+        await self._write_pending()
 
     async def get_history(self, chat_id):
         async with self.lock:
@@ -30,19 +152,24 @@ class EpisodicMemory:
 
     async def update_history(self, chat_id, history):
         async with self.lock:
-            self.sessions[str(chat_id)] = history
-            self._save() # Synchronous save for now, could be async in real thread
+            cid = str(chat_id)
+            self.sessions[cid] = history
+            self._log(cid, 0)
 
     async def add_message(self, chat_id, role, content):
+        await self.add_messages(chat_id, [(role, content)])
+
+    async def add_messages(self, chat_id, messages):
+        """Appends several (role, content) pairs with a single log write."""
         async with self.lock:
             cid = str(chat_id)
-            if cid not in self.sessions:
-                self.sessions[cid] = []
-
-            self.sessions[cid].append({"role": role, "content": content})
-            self._save()
+            history = self.sessions.setdefault(cid, [])
+            start = len(history)
+            history.extend({"role": role, "content": content} for role, content in messages)
+            self._log(cid, start)
 
     async def clear(self, chat_id):
         async with self.lock:
-            self.sessions[str(chat_id)] = []
-            self._save()
+            cid = str(chat_id)
+            self.sessions[cid] = []
+            self._log(cid, 0)
@@ -1,29 +1,49 @@
-import json
 import os
 import math
 import re
+import heapq
+from collections import Counter
+
+from core import json_utils
+
+_TOKEN_RE = re.compile(r"\w+")
 
 class VectorMemory:
     def __init__(self, storage_file="data/vector_memory.json"):
         self.storage_file = storage_file
         self.memory = []
+        # In-memory inverted index (not persisted): token -> positions of items containing it
+        self._index = {}
+        self._sizes = []  # distinct token count per item, by position
         self._load()
 
     def _load(self):
         if os.path.exists(self.storage_file):
             try:
-                with open(self.storage_file, "r", encoding="utf-8") as f:
-                    self.memory = json.load(f)
+                with open(self.storage_file, "rb") as f:
+                    self.memory = json_utils.loads(f.read())
             except:
                 self.memory = []
         else:
             self.memory = []
 
+        self._index = {}
+        self._sizes = []
+        for item in self.memory:
+            self._index_item(item)
+
+    def _index_item(self, item):
+        position = len(self._sizes)
+        tokens = set(_TOKEN_RE.findall(item["text"].lower()))
+        for token in tokens:
+            self._index.setdefault(token, []).append(position)
+        self._sizes.append(len(tokens))
+
     def _save(self):
         # ensure dir exists
         os.makedirs(os.path.dirname(self.storage_file), exist_ok=True)
-        with open(self.storage_file, "w", encoding="utf-8") as f:
-            json.dump(self.memory, f, ensure_ascii=False, indent=2)
+        with open(self.storage_file, "wb") as f:
+            f.write(json_utils.dumps_bytes(self.memory))
 
     def add(self, text, metadata=None):
         """Adds a memory item."""
@@ -36,6 +56,7 @@ class VectorMemory:
             "timestamp": None # Add timestamp if needed
         }
         self.memory.append(entry)
+        self._index_item(entry)
         self._save()
 
     def search(self, query, k=3):
@@ -46,25 +67,20 @@ class VectorMemory:
         if not self.memory:
             return []
 
-        query_tokens = set(re.findall(r"\w+", query.lower()))
-        results = []
-
-        for item in self.memory:
-            text = item["text"]
-            text_tokens = set(re.findall(r"\w+", text.lower()))
-
-            if not text_tokens:
-                score = 0
-            else:
-                # Jaccard similarity as a proxy for semantic relevance
-                intersection = query_tokens.intersection(text_tokens)
-                union = query_tokens.union(text_tokens)
-                score = len(intersection) / len(union) if union else 0
+        query_tokens = set(_TOKEN_RE.findall(query.lower()))
 
-            if score > 0:
-                results.append((score, item))
+        # Only items sharing a token with the query can score above zero; count the overlap per item
+        overlap = Counter()
+        for token in query_tokens:
+            overlap.update(self._index.get(token, ()))
 
-        # Sort by score desc
-        results.sort(key=lambda x: x[0], reverse=True)
+        # Jaccard similarity as a proxy for semantic relevance, derived from the overlap counts.
+        # Negated so nsmallest gives score desc with ties in insertion order, without sorting every candidate.
+        query_size = len(query_tokens)
+        scored = (
+            (-intersection / (query_size + self._sizes[position] - intersection), position)
+            for position, intersection in overlap.items()
+        )
+        top = heapq.nsmallest(k, scored)
 
-        return [r[1] for r in results[:k]]
+        return [self.memory[position] for _, position in top]
@@ -1,11 +1,24 @@
 import os
 import time
+import atexit
 import hashlib
 import traceback
+import threading
+from collections import OrderedDict
+
+from core.memory.embedding_cache import EmbeddingCache
+
+# Recent search results are reused for identical queries; any write clears them
+SEARCH_CACHE_SIZE = 2000
+SEARCH_CACHE_TTL = 300  # seconds
 
 class VectorMemory:
     def __init__(self, collection_name="user_facts", persist_path="data/chroma_db"):
         self.enabled = False
+        self._search_cache = OrderedDict()  # (query, n_results) -> (stored_at, documents), LRU order
+        self._search_lock = threading.Lock()
+        # Bumped by every write; a search that overlapped one doesn't cache its result
+        self._search_generation = 0
         try:
             import chromadb
             # Try to initialize PersistentClient
@@ -15,6 +28,14 @@ class VectorMemory:
 
             self.client = chromadb.PersistentClient(path=persist_path)
             self.collection = self.client.get_or_create_collection(name=collection_name)
+
+            # Embed through a cache with the collection's default model, so repeated texts
+            # (re-asked queries, re-stored facts) skip the model run
+            from chromadb.utils import embedding_functions
+            self.embedding_function = embedding_functions.DefaultEmbeddingFunction()
+            self.embedding_cache = EmbeddingCache(persist_path=os.path.join(persist_path, "embedding_cache.pkl"))
+            # Saved periodically after writes; whatever is left is saved on exit
+            atexit.register(self._save_embedding_cache)
             self.enabled = True
             print(f"Vector Memory initialized at {persist_path}")
         except Exception as e:
@@ -22,25 +43,73 @@ class VectorMemory:
             print("Falling back to text file memory (legacy mode) or disabled.")
             self.enabled = False
 
+    def _embed(self, texts):
+        return self.embedding_cache.get_or_compute(texts, self.embedding_function)
+
+    def _save_embedding_cache(self, force=True):
+        # The fact is already stored; failing to persist the cache must not fail the write
+        try:
+            if force:
+                self.embedding_cache.save()
+            else:
+                self.embedding_cache.maybe_save()
+        except Exception as e:
+            print(f"Warning: could not save embedding cache: {e}")
+
+    def _store(self, texts, metadatas):
+        """Embeds texts in one batch and writes them to the collection in one call. Returns their IDs."""
+        now = time.time()
+        doc_ids = [hashlib.md5(f"{text}{now}{i}".encode()).hexdigest() for i, text in enumerate(texts)]
+        try:
+            self.collection.add(
+                documents=texts,
+                embeddings=self._embed(texts),
+                metadatas=metadatas,
+                ids=doc_ids
+            )
+        finally:
+            # Even a failed add may have written part of the batch
+            with self._search_lock:
+                self._search_cache.clear()
+                self._search_generation += 1
+        self._save_embedding_cache(force=False)
+        return doc_ids
+
     def add(self, text, metadata=None):
         if not self.enabled:
             return "Vector memory not enabled."
 
         try:
-            doc_id = hashlib.md5(f"{text}{time.time()}".encode()).hexdigest()
-            self.collection.add(
-                documents=[text],
-                metadatas=[metadata or {}],
-                ids=[doc_id]
-            )
+            doc_id = self._store([text], [metadata or {}])[0]
             return f"Fact stored (ID: {doc_id})"
         except Exception as e:
             return f"Error adding to vector memory: {e}"
 
+    def add_many(self, texts, metadatas=None):
+        """Stores several facts at once; much cheaper than calling add() per fact."""
+        if not self.enabled:
+            return "Vector memory not enabled."
+        if not texts:
+            return "No facts to store."
+
+        try:
+            doc_ids = self._store(list(texts), metadatas or [{} for _ in texts])
+            return f"{len(doc_ids)} facts stored"
+        except Exception as e:
+            return f"Error adding to vector memory: {e}"
+
     def search(self, query, n_results=3):
         if not self.enabled:
             return []
 
+        key = (query, n_results)
+        with self._search_lock:
+            generation = self._search_generation
+            entry = self._search_cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= SEARCH_CACHE_TTL:
+                self._search_cache.move_to_end(key)
+                return list(entry[1])
+
         try:
             count = self.collection.count()
             if count == 0:
@@ -48,10 +117,17 @@ class VectorMemory:
 
             n = min(n_results, count)
             results = self.collection.query(
-                query_texts=[query],
+                query_embeddings=self._embed([query]),
                 n_results=n
             )
-            return results["documents"][0] if results["documents"] else []
+            documents = results["documents"][0] if results["documents"] else []
+            with self._search_lock:
+                if generation == self._search_generation:
+                    self._search_cache[key] = (time.monotonic(), documents)
+                    self._search_cache.move_to_end(key)
+                    while len(self._search_cache) > SEARCH_CACHE_SIZE:
+                        self._search_cache.popitem(last=False)
+            return list(documents)
         except Exception as e:
             print(f"Error searching vector memory: {e}")
             return []
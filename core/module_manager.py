@@ -6,23 +6,68 @@ import glob
 import sys
 import traceback
 
+def _signature(func):
+    """Inspects a tool once at registration; None if it has no introspectable signature."""
+    try:
+        return inspect.signature(func)
+    except (TypeError, ValueError):
+        return None
+
+# Tool parameters filled from the chat context rather than by the LLM
+_CONTEXT_PARAMS = ("chat_id", "bot", "job_queue")
+
+def _make_caller(manager, func, sig):
+    """
+    Builds the call path for one tool at registration, so execute() doesn't re-check
+    which context arguments the function takes on every call.
+    """
+    params = sig.parameters if sig else {}
+    injected = tuple(name for name in _CONTEXT_PARAMS if name in params)
+    # Legacy modules expect a registry object with an execute method; the manager provides it
+    wants_registry = "registry" in params
+    wants_context = "context" in params
+    # Arguments the LLM invents are dropped rather than failing the call; None accepts anything
+    accepted = frozenset(params)
+    if not sig or any(p.kind is inspect.Parameter.VAR_KEYWORD for p in params.values()):
+        accepted = None
+
+    def call(tool_context, kwargs):
+        if accepted is not None and not accepted.issuperset(kwargs):
+            kwargs = {k: v for k, v in kwargs.items() if k in accepted}
+        if tool_context:
+            for name in injected:
+                if name in tool_context:
+                    kwargs[name] = tool_context[name]
+            if wants_registry:
+                kwargs["registry"] = manager
+            if wants_context:
+                kwargs["context"] = tool_context
+        return func(**kwargs)
+
+    return call
+
 class RegistryAdapter:
     def __init__(self, manager):
         self.manager = manager
 
-    def register(self, name, func, description, requires_context=False):
+    def register(self, name, func, description, requires_context=False, inline=False):
         # Determine if async
         is_async = inspect.iscoroutinefunction(func)
 
         # Register tool in manager
+        sig = _signature(func)
         self.manager.tools[name] = func
         self.manager.tool_metadata[name] = {
             "name": name,
             "func": func,
             "description": description,
             "is_async": is_async,
-            "requires_context": requires_context
+            "requires_context": requires_context,
+            "inline": inline,
+            "signature": sig,
+            "call": _make_caller(self.manager, func, sig)
         }
+        self.manager.version += 1
 
 class ModuleManager:
     def __init__(self, modules_dir="modules"):
@@ -31,6 +76,10 @@ class ModuleManager:
         self.tools = {}    # map tool_name -> function
         self.tool_metadata = {} # map tool_name -> metadata
         self.descriptions = []
+        self.version = 0   # bumped on every registration so callers can cache definitions
+        self._definitions = None
+        self._definitions_version = -1
+        self._closers = {}  # module name -> async close() the module defines for its shared resources
 
     def load_modules(self):
         """Scans the modules directory and loads all valid modules."""
@@ -73,12 +122,16 @@ class ModuleManager:
                     sys.modules[f"modules.{module_name}"] = module
                     spec.loader.exec_module(module)
 
+                    if inspect.iscoroutinefunction(getattr(module, "close", None)):
+                        self._closers[module_name] = module.close
+
                     # Register tools
                     if "tools" in config:
                         for tool_name in config["tools"]:
                             if hasattr(module, tool_name):
                                 func = getattr(module, tool_name)
-                                self.register_tool(tool_name, func, config.get("description", ""))
+                                inline = tool_name in config.get("inline_tools", [])
+                                self.register_tool(tool_name, func, config.get("description", ""), inline=inline)
                             else:
                                 print(f"Warning: Tool '{tool_name}' defined in {json_path} but not found in {tools_path}")
 
@@ -112,26 +165,52 @@ class ModuleManager:
             # Don't print stack trace for missing dependencies to reduce noise, just log error
             # traceback.print_exc()
 
-    def register_tool(self, name, func, module_description):
-        """Registers a tool function."""
+    def register_tool(self, name, func, module_description, inline=False):
+        """
+        Registers a tool function.
+        inline tools are sync functions cheap enough (microseconds, no I/O) to call directly
+        on the event loop instead of handing them to the tool thread pool.
+        """
         self.tools[name] = func
 
         # Extract docstring as description if available, otherwise use module description
         desc = func.__doc__.strip() if func.__doc__ else module_description
 
+        sig = _signature(func)
         self.tool_metadata[name] = {
             "name": name,
             "func": func,
             "description": desc,
             "is_async": inspect.iscoroutinefunction(func),
-            "requires_context": False
+            "requires_context": False,
+            "inline": inline,
+            "signature": sig,
+            "call": _make_caller(self, func, sig)
         }
+        self.version += 1
+
+    async def close(self):
+        """Awaits each module's close() so sessions and connectors they hold are released. Call at shutdown."""
+        for module_name, close in self._closers.items():
+            try:
+                await close()
+            except Exception as e:
+                print(f"Error closing module {module_name}: {e}")
 
     def get_tool(self, name):
         return self.tools.get(name)
 
     def get_definitions(self):
-        """Returns OpenAI-compatible tool definitions."""
+        """
+        Returns OpenAI-compatible tool definitions.
+        The list is rebuilt only after a tool is registered; callers share it and must not modify it.
+        """
+        if self._definitions_version != self.version:
+            self._definitions = self._build_definitions()
+            self._definitions_version = self.version
+        return self._definitions
+
+    def _build_definitions(self):
         definitions = []
         for name, meta in self.tool_metadata.items():
             func = meta["func"]
@@ -139,7 +218,7 @@ class ModuleManager:
 
             # Simple parameter extraction (can be improved)
             try:
-                sig = inspect.signature(func)
+                sig = meta.get("signature") or inspect.signature(func)
                 properties = {}
                 required = []
 
@@ -176,40 +255,29 @@ class ModuleManager:
         return definitions
 
     def execute(self, tool_name, tool_context=None, **kwargs):
-        """Executes a tool."""
+        """Executes a tool. Async tools return their coroutine; see execute_async."""
         if tool_name not in self.tools:
             return f"Error: Tool '{tool_name}' not found."
 
-        func = self.tools[tool_name]
         meta = self.tool_metadata.get(tool_name, {})
-        requires_context = meta.get("requires_context", False)
+        call = meta.get("call")
+        if call is None:
+            func = self.tools[tool_name]
+            call = _make_caller(self, func, _signature(func))
 
         try:
-            # Inject context if required or if explicitly requested in signature
-            sig = inspect.signature(func)
-
-            # Legacy context handling: some tools use explicit 'bot', 'chat_id' args
-            if tool_context:
-                if "chat_id" in sig.parameters and "chat_id" in tool_context:
-                    kwargs["chat_id"] = tool_context["chat_id"]
-                if "bot" in sig.parameters and "bot" in tool_context:
-                    kwargs["bot"] = tool_context["bot"]
-                if "job_queue" in sig.parameters and "job_queue" in tool_context:
-                    kwargs["job_queue"] = tool_context["job_queue"]
-                if "registry" in sig.parameters:
-                    # Circular dep risk? pass self or minimal interface?
-                    # Legacy modules expect registry object with execute method
-                    # But registry also had set_global_context etc.
-                    # Let's pass 'self' as registry, assuming it has compatible 'execute' method (it does!)
-                    kwargs["registry"] = self
-
-                # Context dict injection
-                if "context" in sig.parameters:
-                    kwargs["context"] = tool_context
-
-            # If tool marked as requires_context (from legacy registry), merge it into kwargs?
-            # Or assume explicit args handling above covers it.
-
-            return func(**kwargs)
+            # Context arguments (chat_id, bot, job_queue, registry, context) are injected by the caller built at registration
+            return call(tool_context, kwargs)
         except Exception as e:
             return f"Error executing {tool_name}: {str(e)}"
+
+    async def execute_async(self, tool_name, tool_context=None, **kwargs):
+        """
+        Executes an async tool and returns its result.
+        execute() hands back the coroutine for async tools (or an error string), so await only when needed.
+        Sync tools would block the loop here; run those through an executor instead.
+        """
+        result = self.execute(tool_name, tool_context=tool_context, **kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
@@ -1,20 +1,11 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncGenerator
 import json
 import uuid
 from core.task_graph import TaskGraph, Task
+from core import json_utils
 
-class Planner:
-    def __init__(self, llm_service):
-        self.llm = llm_service
-
-    async def create_plan(self, user_input: str, history: List[Dict], available_tools: List[Dict]) -> TaskGraph:
-        """
-        Generates a TaskGraph for the user request.
-        """
-
-        tool_definitions = json.dumps(available_tools, indent=2)
-
-        system_prompt = f"""
+# Formatted with str.format, hence the doubled braces around the JSON example
+PLAN_PROMPT_TEMPLATE = """
 You are the Planner of an AI agent.
 Create a step-by-step execution plan to solve the user's request.
 
@@ -45,11 +36,43 @@ RULES:
    (Note: For this system, the last task's output is usually the answer).
 """
 
-        messages = [
-            {"role": "system", "content": system_prompt},
+class Planner:
+    def __init__(self, llm_service):
+        self.llm = llm_service
+        # ModuleManager hands out the same definitions list until a tool is registered,
+        # so the serialized prompt is rebuilt only when that list changes
+        self._prompt_tools = None
+        self._system_prompt = None
+
+    def _get_system_prompt(self, available_tools: List[Dict]) -> str:
+        if available_tools is not self._prompt_tools:
+            tool_definitions = json_utils.dumps(available_tools, indent=True)
+            self._system_prompt = PLAN_PROMPT_TEMPLATE.format(tool_definitions=tool_definitions)
+            self._prompt_tools = available_tools
+        return self._system_prompt
+
+    def _build_messages(self, user_input: str, history: List[Dict], available_tools: List[Dict]) -> List[Dict]:
+        return [
+            {"role": "system", "content": self._get_system_prompt(available_tools)},
             {"role": "user", "content": f"Context: {history[-3:] if history else []}\nRequest: {user_input}"}
         ]
 
+    @staticmethod
+    def _task_from_dict(task_def: Dict[str, Any]) -> Task:
+        return Task(
+            tool=task_def["tool"],
+            args=task_def.get("args", {}),
+            dependencies=task_def.get("dependencies", []),
+            task_id=task_def.get("id")
+        )
+
+    async def create_plan(self, user_input: str, history: List[Dict], available_tools: List[Dict]) -> TaskGraph:
+        """
+        Generates a TaskGraph for the user request.
+        """
+
+        messages = self._build_messages(user_input, history, available_tools)
+
         try:
             response = await self.llm.generate(
                 messages,
@@ -64,20 +87,60 @@ RULES:
             elif "```" in content:
                 content = content.split("```")[1].split("```")[0].strip()
 
-            plan_data = json.loads(content)
+            plan_data = json_utils.loads(content)
 
             graph = TaskGraph()
             for task_def in plan_data:
-                task = Task(
-                    tool=task_def["tool"],
-                    args=task_def.get("args", {}),
-                    dependencies=task_def.get("dependencies", []),
-                    task_id=task_def.get("id")
-                )
-                graph.add_task(task)
+                graph.add_task(self._task_from_dict(task_def))
 
             return graph
 
+        except json.JSONDecodeError as e:
+            print(f"Planning error: invalid JSON ({e}). Raw response: {content[:500]!r}")
+            return TaskGraph()
         except Exception as e:
             print(f"Planning error: {e}")
             return TaskGraph() # Return empty graph on failure
+
+    async def stream_plan(self, user_input: str, history: List[Dict], available_tools: List[Dict]) -> AsyncGenerator[Task, None]:
+        """
+        Streams the plan and yields each Task as soon as its JSON object is complete,
+        so the executor can start early tasks while the rest of the plan is still being written.
+        Malformed task objects are skipped.
+        """
+        messages = self._build_messages(user_input, history, available_tools)
+        stream = await self.llm.generate(messages, provider="deepseek", stream=True)
+
+        # Track nesting outside of JSON strings: depth 1 is the top-level array, depth 2 a task object
+        depth = 0
+        in_string = False
+        escaped = False
+        current = []
+
+        async for text in stream:
+            for ch in text:
+                if depth >= 2:
+                    current.append(ch)
+
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif ch == "\\":
+                        escaped = True
+                    elif ch == '"':
+                        in_string = False
+                elif ch == '"':
+                    in_string = True
+                elif ch in "[{":
+                    depth += 1
+                    if depth == 2:
+                        current = [ch]
+                elif ch in "]}":
+                    depth -= 1
+                    if depth == 1 and current:
+                        task_json = "".join(current)
+                        current = []
+                        try:
+                            yield self._task_from_dict(json_utils.loads(task_json))
+                        except (ValueError, KeyError, TypeError) as e:
+                            print(f"Planning error: skipping malformed task ({e}): {task_json[:200]!r}")
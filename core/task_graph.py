@@ -30,36 +30,50 @@ class Task:
 
 class TaskGraph:
     def __init__(self, tasks: List[Task] = None):
-        self.tasks = {t.id: t for t in (tasks or [])}
+        self.tasks = {}
+        # Kept up to date as tasks complete, so finding ready tasks never rescans the whole graph
+        self._dependents = {}  # task_id -> ids of tasks that depend on it
+        self._unmet = {}       # task_id -> number of dependencies not yet completed
+        self._ready = {}       # task_id -> task with all dependencies completed, in the order they became ready
+        for task in tasks or []:
+            self.add_task(task)
 
     def add_task(self, task: Task):
         self.tasks[task.id] = task
+        unmet = 0
+        for dep_id in task.dependencies:
+            self._dependents.setdefault(dep_id, []).append(task.id)
+            dep_task = self.tasks.get(dep_id)
+            if not dep_task or dep_task.status != TaskStatus.COMPLETED:
+                unmet += 1
+        self._unmet[task.id] = unmet
+        if unmet == 0:
+            self._ready[task.id] = task
 
     def get_task(self, task_id: str) -> Optional[Task]:
         return self.tasks.get(task_id)
 
     def get_ready_tasks(self) -> List[Task]:
         """Returns tasks that are PENDING and have all dependencies COMPLETED."""
-        ready = []
-        for task in self.tasks.values():
-            if task.status != TaskStatus.PENDING:
-                continue
-
-            deps_met = True
-            for dep_id in task.dependencies:
-                dep_task = self.tasks.get(dep_id)
-                if not dep_task or dep_task.status != TaskStatus.COMPLETED:
-                    deps_met = False
-                    break
-
-            if deps_met:
-                ready.append(task)
-        return ready
+        # Tasks leave the ready set once they are started (or otherwise leave PENDING)
+        for task_id in [tid for tid, t in self._ready.items() if t.status != TaskStatus.PENDING]:
+            del self._ready[task_id]
+        return list(self._ready.values())
 
     def mark_completed(self, task_id: str, result: Any):
         if task_id in self.tasks:
-            self.tasks[task_id].status = TaskStatus.COMPLETED
-            self.tasks[task_id].result = result
+            task = self.tasks[task_id]
+            already_completed = task.status == TaskStatus.COMPLETED
+            task.status = TaskStatus.COMPLETED
+            task.result = result
+            if already_completed:
+                return
+            for dependent_id in self._dependents.get(task_id, []):
+                if dependent_id not in self._unmet:
+                    continue
+                self._unmet[dependent_id] -= 1
+                if self._unmet[dependent_id] == 0:
+                    self._ready[dependent_id] = self.tasks[dependent_id]
 
     def mark_failed(self, task_id: str, error: str):
         if task_id in self.tasks:
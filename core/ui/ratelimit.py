@@ -0,0 +1,44 @@
+import time
+import asyncio
+
+class AsyncTokenBucket:
+    """
+    Token bucket per key: refills `rate` tokens per second, holds at most `capacity`.
+    acquire() reserves a token immediately and sleeps off any deficit, so waiters are served in call order.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets = {}  # key -> (tokens, updated_at); tokens go negative while callers wait
+
+    async def acquire(self, key=None):
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated_at) * self.rate) - 1
+        self._buckets[key] = (tokens, now)
+        if tokens < 0:
+            try:
+                await asyncio.sleep(-tokens / self.rate)
+            except asyncio.CancelledError:
+                self.release(key)
+                raise
+
+    def release(self, key=None):
+        """Returns a token taken by acquire() for a request that was never sent."""
+        tokens, updated_at = self._buckets[key]
+        self._buckets[key] = (tokens + 1, updated_at)
+
+# Telegram allows about one message per second per chat (short bursts are tolerated) and 30 per second overall
+chat_bucket = AsyncTokenBucket(rate=1, capacity=3)
+global_bucket = AsyncTokenBucket(rate=30, capacity=30)
+
+async def throttle(chat_id):
+    """Waits until a request to chat_id fits both the per-chat and the global limit."""
+    await chat_bucket.acquire(chat_id)
+    try:
+        await global_bucket.acquire()
+    except asyncio.CancelledError:
+        # A cancelled status edit must not delay the next request to this chat
+        chat_bucket.release(chat_id)
+        raise
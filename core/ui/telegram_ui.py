@@ -1,89 +1,214 @@
-import time
+import random
 import asyncio
+import datetime
 import logging
 
+from telegram.error import BadRequest, RetryAfter
+
+from core.ui.ratelimit import chat_bucket, throttle
+
+# Shared by the manager and every per-message editor
+logger = logging.getLogger("TelegramUI")
+
+def _not_modified(error):
+    """True if Telegram rejected an edit only because the message already shows that text."""
+    return isinstance(error, BadRequest) and error.message.startswith("Message is not modified")
+
+def _chunks(text, max_len):
+    for i in range(0, len(text), max_len):
+        yield text[i:i+max_len]
+
+def _markdown_parse_mode(text):
+    """
+    Returns "Markdown" if text can be sent as legacy Markdown, None if it should go as plain text.
+    An unclosed *, _ or ` makes Telegram reject the message, so that case skips the doomed Markdown attempt.
+    """
+    blocks = text.split("```")
+    if len(blocks) % 2 == 0:
+        return None
+    for block in blocks[::2]:
+        spans = block.split("`")
+        if len(spans) % 2 == 0:
+            return None
+        # Entity markers inside code are literal
+        for span in spans[::2]:
+            if span.count("*") % 2 or span.count("_") % 2:
+                return None
+    return "Markdown"
+
 class TelegramUIManager:
     def __init__(self, bot):
         self.bot = bot
-        self.last_edit_time = 0
-        self.last_status_text = ""
-        self.logger = logging.getLogger("TelegramUI")
+        self._editors = {}  # (chat_id, message_id) -> ThrottledEditor for status updates
 
     async def send_initial_status(self, chat_id, text="Thinking..."):
         """Sends the initial status message and returns it."""
         try:
+            await throttle(chat_id)
             msg = await self.bot.send_message(chat_id=chat_id, text=text)
-            self.last_status_text = text
             return msg
         except Exception as e:
-            self.logger.error(f"Failed to send initial status: {e}")
+            logger.error("Failed to send initial status: %s", e)
             return None
 
     async def update_status(self, chat_id, message_id, text, force=False):
-        """Updates the status message with rate limiting."""
-        current_time = time.time()
+        """
+        Updates the status message, at most one edit per second.
+        Updates inside that window are coalesced rather than dropped: the latest text is sent on the next tick.
+        """
+        editor = self._editors.get((chat_id, message_id))
+        if editor is None:
+            editor = ThrottledEditor(self.bot, chat_id, message_id)
+            editor.start()
+            self._editors[(chat_id, message_id)] = editor
 
-        # Rate limit: max 1 edit per second unless forced
-        if not force and (current_time - self.last_edit_time < 1.0):
-            return
+        editor.set(text)
+        if force:
+            await editor.flush()
 
-        if text == self.last_status_text:
-            return
+    async def send_final_response(self, chat_id, message_id, text):
+        """Sends the final response, overwriting the status message."""
+        # A queued status edit must not land on top of the final text
+        editor = self._editors.pop((chat_id, message_id), None)
+        if editor is not None:
+            await editor.stop()
 
-        try:
-            # Simple truncation to avoid Telegram limits
-            display_text = text
-            if len(display_text) > 4000:
-                display_text = display_text[:3997] + "..."
+        # Split if too long; each chunk is sliced only when its turn comes
+        chunks = _chunks(text, 4000)
+        first_chunk = next(chunks, text)
 
-            await self.bot.edit_message_text(
-                chat_id=chat_id,
-                message_id=message_id,
-                text=display_text,
-                parse_mode=None # Plain text for status updates to avoid Markdown errors
-            )
-            self.last_status_text = text
-            self.last_edit_time = current_time
+        # The first chunk must be in place (edited in, or re-sent if the edit fails) before the rest,
+        # otherwise a fallback message would arrive after chunks 2..N
+        try:
+            await self._edit_markdown(chat_id, message_id, first_chunk)
         except Exception as e:
-            # Ignore "Message is not modified" errors
-            if "not modified" not in str(e):
-                self.logger.warning(f"Failed to update status: {e}")
+            logger.error("Failed to send final response: %s", e)
+            # Try sending as new message if edit fails completely
+            try:
+                await self._send_markdown(chat_id, first_chunk)
+            except Exception:
+                pass
 
-    async def send_final_response(self, chat_id, message_id, text):
-        """Sends the final response, overwriting the status message."""
+        # Send remaining chunks as new messages, one by one to keep their order
         try:
-            # Split if too long
-            max_len = 4000
-            chunks = [text[i:i+max_len] for i in range(0, len(text), max_len)]
+            for chunk in chunks:
+                await self._send_markdown(chat_id, chunk)
+        except Exception as e:
+            logger.error("Failed to send final response: %s", e)
 
-            # Edit first chunk into status message
-            first_chunk = chunks[0]
+    async def _edit_markdown(self, chat_id, message_id, text):
+        """Edits a message as Markdown, falling back to plain text if Telegram rejects the markup."""
+        parse_mode = _markdown_parse_mode(text)
+        if parse_mode:
             try:
+                await throttle(chat_id)
                 await self.bot.edit_message_text(
                     chat_id=chat_id,
                     message_id=message_id,
-                    text=first_chunk,
-                    parse_mode="Markdown"
+                    text=text,
+                    parse_mode=parse_mode
                 )
+                return
             except Exception as e:
-                # Fallback to plain text if Markdown fails
-                await self.bot.edit_message_text(
-                    chat_id=chat_id,
-                    message_id=message_id,
-                    text=first_chunk
-                )
-
-            # Send remaining chunks as new messages
-            for chunk in chunks[1:]:
-                try:
-                    await self.bot.send_message(chat_id=chat_id, text=chunk, parse_mode="Markdown")
-                except:
-                    await self.bot.send_message(chat_id=chat_id, text=chunk)
+                if _not_modified(e):
+                    return
+        try:
+            await throttle(chat_id)
+            await self.bot.edit_message_text(
+                chat_id=chat_id,
+                message_id=message_id,
+                text=text
+            )
+        except BadRequest as e:
+            # Already showing this text; retrying or resending it as a new message would only duplicate it
+            if not _not_modified(e):
+                raise
 
-        except Exception as e:
-            self.logger.error(f"Failed to send final response: {e}")
-            # Try sending as new message if edit fails completely
+    async def _send_markdown(self, chat_id, text):
+        """Sends a message as Markdown, falling back to plain text if Telegram rejects the markup."""
+        parse_mode = _markdown_parse_mode(text)
+        if parse_mode:
             try:
-                await self.bot.send_message(chat_id=chat_id, text=text)
-            except:
+                await throttle(chat_id)
+                await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                return
+            except Exception:
                 pass
+        await throttle(chat_id)
+        await self.bot.send_message(chat_id=chat_id, text=text)
+
+class ThrottledEditor:
+    """Coalesces status edits for one message and flushes only the latest text."""
+
+    def __init__(self, bot, chat_id, message_id, interval=None):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        # Editing faster than the per-chat rate limit would only queue edits behind the limiter
+        self.interval = interval if interval is not None else 1 / chat_bucket.rate
+        self.latest_text = ""
+        self.sent_text = ""
+        self._changed = asyncio.Event()
+        self._task = None
+
+    def set(self, text):
+        """Stores the newest text; the background loop picks it up on its next tick."""
+        self.latest_text = text
+        self._changed.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def run(self):
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            await self.flush()
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        """Stops the edit loop. Pending text is dropped; the caller sends the final state."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def flush(self):
+        """Sends the latest text now if it differs from what is shown."""
+        text = self.latest_text
+        if text == self.sent_text:
+            return
+
+        display_text = text
+        if len(display_text) > 4000:
+            display_text = display_text[:3997] + "..."
+
+        try:
+            await throttle(self.chat_id)
+            await self.bot.edit_message_text(
+                chat_id=self.chat_id,
+                message_id=self.message_id,
+                text=display_text,
+                parse_mode=None
+            )
+            self.sent_text = text
+        except RetryAfter as e:
+            # Flood control: back off as instructed and retry with whatever is latest then
+            retry_after = e.retry_after
+            if isinstance(retry_after, datetime.timedelta):
+                retry_after = retry_after.total_seconds()
+            await asyncio.sleep(retry_after + random.uniform(0.1, 0.5))
+            self._changed.set()
+        except BadRequest as e:
+            if _not_modified(e):
+                self.sent_text = text
+            else:
+                logger.warning("Failed to update status: %s", e)
+        except Exception as e:
+            logger.warning("Failed to update status: %s", e)
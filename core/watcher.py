@@ -6,7 +6,7 @@ from watchdog.events import FileSystemEventHandler
 class ModuleHandler(FileSystemEventHandler):
     def __init__(self, registry):
         self.registry = registry
-        self.last_reload = 0
+        self.last_reload = float("-inf")
 
     def on_created(self, event):
         if event.is_directory:
@@ -22,7 +22,7 @@ class ModuleHandler(FileSystemEventHandler):
 
     def _trigger_reload(self):
         # Debounce reload (1 second)
-        now = time.time()
+        now = time.monotonic()
         if now - self.last_reload < 1:
             return
         self.last_reload = now
@@ -1,12 +1,31 @@
 import asyncio
 import datetime
-import pytz
+import time
+from zoneinfo import ZoneInfo
 from typing import Dict, Any, Optional
 
 # Constants
-IRKUTSK_TZ = pytz.timezone("Asia/Irkutsk")
-MOSCOW_TZ = pytz.timezone("Europe/Moscow")
-UTC_TZ = pytz.UTC
+IRKUTSK_TZ = ZoneInfo("Asia/Irkutsk")
+MOSCOW_TZ = ZoneInfo("Europe/Moscow")
+UTC_TZ = datetime.timezone.utc
+
+# strftime("%A") goes through the locale on every call; weekday() indexes this instead
+_WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+# One HTTP session for all weather requests (keeps connections to wttr.in alive), created on first use
+_weather_session = None
+
+# city -> (fetched_at, text); repeated questions within the TTL don't hit wttr.in again
+_weather_cache = {}
+WEATHER_CACHE_TTL = 60
+WEATHER_CACHE_SIZE = 256
+
+def _date_time(dt):
+    """Returns ("YYYY-MM-DD", "HH:MM:SS") for dt, formatted straight from its fields."""
+    return (
+        f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d}",
+        f"{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}",
+    )
 
 # User preferences storage
 _user_date_prefs = {
@@ -15,65 +34,92 @@ _user_date_prefs = {
     "user_confirmed": False,
 }
 
-async def get_current_time() -> str:
+def get_current_time() -> str:
     """Get current time in human-readable format"""
     try:
-        now = datetime.datetime.now()
-        return now.strftime("%Y-%m-%d %H:%M:%S")
+        date_str, time_str = _date_time(datetime.datetime.now())
+        return f"{date_str} {time_str}"
     except Exception as e:
         return f"Error: {str(e)}"
 
-async def get_irkutsk_time() -> Dict[str, Any]:
+def get_irkutsk_time() -> Dict[str, Any]:
     """Get current time in Irkutsk timezone (UTC+8)"""
     try:
-        utc_now = datetime.datetime.now(pytz.UTC)
-        irkutsk_now = utc_now.astimezone(IRKUTSK_TZ)
+        irkutsk_now = datetime.datetime.now(IRKUTSK_TZ)
+        date_str, time_str = _date_time(irkutsk_now)
 
         return {
-            "date": irkutsk_now.strftime("%Y-%m-%d"),
-            "time": irkutsk_now.strftime("%H:%M:%S"),
-            "day_of_week": irkutsk_now.strftime("%A"),
-            "full_datetime": irkutsk_now.strftime("%Y-%m-%d %H:%M:%S"),
+            "date": date_str,
+            "time": time_str,
+            "day_of_week": _WEEKDAYS[irkutsk_now.weekday()],
+            "full_datetime": f"{date_str} {time_str}",
             "is_working_day": irkutsk_now.weekday() < 5,
             "irkutsk_tz": "UTC+8",
         }
     except Exception as e:
         return {"error": str(e)}
 
+def _get_weather_session():
+    global _weather_session
+    if _weather_session is None or _weather_session.closed:
+        import aiohttp
+
+        _weather_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=10, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=10),
+        )
+    return _weather_session
+
+async def close():
+    """Closes the shared weather session; ModuleManager.close() calls this at shutdown."""
+    global _weather_session
+    if _weather_session is not None:
+        await _weather_session.close()
+        _weather_session = None
+
 async def get_weather(city: str) -> str:
     """Fetch weather from wttr.in"""
-    try:
-        import aiohttp
+    key = city.strip().lower()
+    cached = _weather_cache.get(key)
+    if cached and time.monotonic() - cached[0] < WEATHER_CACHE_TTL:
+        return cached[1]
 
+    try:
         url = f"https://wttr.in/{city}?format=3"
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=10) as response:
-                if response.status == 200:
-                    text = await response.text()
-                    return text.strip()
-                else:
-                    return f"Error: Could not fetch weather for {city}. Status: {response.status}"
+        async with _get_weather_session().get(url) as response:
+            if response.status == 200:
+                text = (await response.text()).strip()
+                if len(_weather_cache) >= WEATHER_CACHE_SIZE:
+                    _weather_cache.clear()
+                _weather_cache[key] = (time.monotonic(), text)
+                return text
+            else:
+                return f"Error: Could not fetch weather for {city}. Status: {response.status}"
     except Exception as e:
         return f"Error fetching weather: {str(e)}"
 
-async def get_current_datetime_info() -> Dict[str, Any]:
+def get_current_datetime_info() -> Dict[str, Any]:
     """Get detailed datetime information with timezone data"""
     try:
-        now = datetime.datetime.now()
-        irkutsk_now = datetime.datetime.now(IRKUTSK_TZ)
+        # One clock read for both zones, so system and Irkutsk values describe the same instant
+        utc_now = datetime.datetime.now(UTC_TZ)
+        now = utc_now.astimezone()
+        irkutsk_now = utc_now.astimezone(IRKUTSK_TZ)
+        system_date, system_time = _date_time(now)
+        irkutsk_date, irkutsk_time = _date_time(irkutsk_now)
 
         info = {
-            "system_date": now.strftime("%Y-%m-%d"),
-            "system_time": now.strftime("%H:%M:%S"),
-            "system_datetime": now.strftime("%Y-%m-%d %H:%M:%S"),
-            "irkutsk_date": irkutsk_now.strftime("%Y-%m-%d"),
-            "irkutsk_time": irkutsk_now.strftime("%H:%M:%S"),
-            "irkutsk_datetime": irkutsk_now.strftime("%Y-%m-%d %H:%M:%S"),
+            "system_date": system_date,
+            "system_time": system_time,
+            "system_datetime": f"{system_date} {system_time}",
+            "irkutsk_date": irkutsk_date,
+            "irkutsk_time": irkutsk_time,
+            "irkutsk_datetime": f"{irkutsk_date} {irkutsk_time}",
             "year": now.year,
             "month": now.month,
             "day": now.day,
-            "weekday": now.strftime("%A"),
+            "weekday": _WEEKDAYS[now.weekday()],
             "is_future": now.year > 2024,
             "timezone": "Asia/Irkutsk (UTC+8)",
             "note": "ВСЕГДА проверяйте эту дату перед ответом на вопросы о текущих событиях!",
@@ -4,19 +4,32 @@ Permanent memory module - ASYNC VERSION
 
 import asyncio
 import os
+import re
 from typing import Optional
 from core.memory_rag import memory_instance
 
 MEMORY_FILE = os.path.join("Permanent memory", "Permanent-memory")
 
+_LIST_MARKER_RE = re.compile(r"^(?:[-*•]|\d+[.)])\s+")
+
+
+def _split_facts(info: str):
+    """One fact per non-empty line, list markers stripped"""
+    facts = [_LIST_MARKER_RE.sub("", line.strip()) for line in info.splitlines()]
+    return [fact for fact in facts if fact]
+
 
 async def update_memory(info: str) -> str:
     """Append important facts to permanent memory"""
     try:
         # Try Vector Memory first
         if memory_instance.enabled:
+            facts = _split_facts(info)
 
             def _add():
+                # Several facts are embedded and stored in one batch, each as its own searchable entry
+                if len(facts) > 1:
+                    return memory_instance.add_many(facts)
                 return memory_instance.add(info)
 
             result = await asyncio.to_thread(_add)
@@ -108,7 +121,7 @@ def register_tools(registry):
     registry.register(
         "update_memory",
         update_memory,
-        "Save fact to permanent memory. Arguments: info (str)",
+        "Save facts to permanent memory. Arguments: info (str, one fact per line)",
     )
     registry.register(
         "read_memory", read_memory, "Read from memory. Arguments: query (str, optional)"
@@ -0,0 +1,5 @@
+from core import event_loop
+
+def pytest_asyncio_loop_factories(config, item):
+    """Async tests run on uvloop where it is available, as bot.py does. They share one session loop (see pyproject.toml)."""
+    return {"default": event_loop.new_event_loop}
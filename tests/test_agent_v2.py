@@ -1,24 +1,27 @@
 import asyncio
-import sys
-import os
-sys.path.append(os.getcwd())
 
 from core.agent import Agent
 
+class _CannedStream:
+    """Async-iterates over a fixed list of deltas; can be iterated again."""
+    def __init__(self, items):
+        self.items = items
+
+    async def __aiter__(self):
+        for item in self.items:
+            yield item
+
 # Mock LLM Service injection to avoid API calls in test
 class MockLLMService:
+    stream = _CannedStream(["Mock response"])
+
+    async def aclose(self):
+        pass
+
     async def generate(self, messages, provider="deepseek", stream=False, tools=None, tool_choice=None):
         if stream:
-            async def gen():
-                class Chunk:
-                    class Choice:
-                        class Delta:
-                            content = "Mock response"
-                            tool_calls = None
-                        delta = Delta()
-                    choices = [Choice()]
-                yield Chunk()
-            return gen()
+            # LLMService streams plain text deltas
+            return self.stream
         else:
             class Message:
                 content = '{"decision": "RESPOND_DIRECTLY"}'
@@ -62,5 +65,23 @@ async def test_agent():
          if update['status'] == 'final':
              print(f"Final: {update['content']}")
 
+    # History is written in the background
+    await agent.shutdown()
+    history = await agent.episodic_memory.get_history("test_user")
+    assert history and history[-1]["content"] == "Mock response", "History not saved"
+    print("OK: History saved")
+
+    # Only the newest messages that fit the token budget are sent to the LLM
+    agent.history_token_budget = 10
+    long_history = [{"role": "user", "content": "x" * 30}, {"role": "assistant", "content": "y" * 30}]
+    window = agent._window_history(long_history)
+    assert len(window) == 1 and window[0]["role"] == "assistant", "History window mismatch"
+    print("OK: History windowed")
+
+    # Large tool output is cut before it reaches the prompt
+    observation = agent._observation_text("z" * 100000)
+    assert len(observation) <= 16000 and observation.endswith("..."), "Observation not bounded"
+    print("OK: Observation bounded")
+
 if __name__ == "__main__":
     asyncio.run(test_agent())
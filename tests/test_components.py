@@ -1,13 +1,11 @@
 import asyncio
 import os
-import sys
 import shutil
 
-# Add project root to path
-sys.path.append(os.getcwd())
-
 from core.memory.vector_memory import VectorMemory
+from core.memory import episodic_memory
 from core.memory.episodic_memory import EpisodicMemory
+from core.memory.embedding_cache import EmbeddingCache
 
 async def test_components():
     print("Testing Components...")
@@ -33,8 +31,9 @@ async def test_components():
     # 2. Episodic Memory
     print("\n[EpisodicMemory]")
     # Clean up test file
-    if os.path.exists("data/test_sessions.json"):
-        os.remove("data/test_sessions.json")
+    for path in ("data/test_sessions.json", "data/test_sessions.json.log"):
+        if os.path.exists(path):
+            os.remove(path)
 
     em = EpisodicMemory("data/test_sessions.json")
     await em.add_message("123", "user", "Hello")
@@ -46,7 +45,106 @@ async def test_components():
     else:
         print("FAIL: History mismatch")
 
-    # 3. UI Manager (Import check only as it requires a bot instance)
+    await em.add_messages("123", [("user", "Hi again"), ("assistant", "Hello there")])
+    await em.flush()
+    # Reload from disk to check a single save covered both messages
+    reloaded = EpisodicMemory("data/test_sessions.json")
+    hist = await reloaded.get_history("123")
+    assert [m["role"] for m in hist] == ["user", "user", "assistant"], "Batched messages mismatch"
+    print("OK: Batched messages saved")
+
+    # A snapshot folds the log in; replaying the old log on top must not duplicate messages
+    with open(reloaded.log_file, encoding="utf-8") as f:
+        stale_log = f.read()
+    reloaded._save()
+    with open(reloaded.log_file, "w", encoding="utf-8") as f:
+        f.write(stale_log)
+    hist = await EpisodicMemory("data/test_sessions.json").get_history("123")
+    assert len(hist) == 3, f"Replay produced {len(hist)} messages"
+    print("OK: Log replay is idempotent")
+    await em.close()
+
+    # A torn last line from a crash is cut off, so the next entry gets a line of its own
+    with open(reloaded.log_file, "a", encoding="utf-8") as f:
+        f.write('{"cid": "123", "sta')
+    after_crash = EpisodicMemory("data/test_sessions.json")
+    await after_crash.add_message("123", "user", "post-torn")
+    await after_crash.close()
+    hist = await EpisodicMemory("data/test_sessions.json").get_history("123")
+    assert hist and hist[-1]["content"] == "post-torn", "Entry after a torn log line was lost"
+    print("OK: Torn log line truncated")
+
+    # A failed disk write is retried by the writer instead of stopping persistence
+    retry_delay = episodic_memory.WRITE_RETRY_DELAY
+    episodic_memory.WRITE_RETRY_DELAY = 0.01
+    try:
+        em = EpisodicMemory("data/test_sessions.json")
+        append_log = em._append_log
+        failures = []
+        def failing_append(lines):
+            if not failures:
+                failures.append(lines)
+                raise OSError("disk full")
+            append_log(lines)
+        em._append_log = failing_append
+        await em.add_message("456", "user", "Retried")
+        await asyncio.sleep(0.2)
+        await em.close()
+    finally:
+        episodic_memory.WRITE_RETRY_DELAY = retry_delay
+    hist = await EpisodicMemory("data/test_sessions.json").get_history("456")
+    assert failures and len(hist) == 1 and not em._pending, f"Write lost after error, history={hist}"
+    print("OK: Failed write retried")
+
+    # 3. Embedding Cache
+    print("\n[EmbeddingCache]")
+    calls = []
+    def fake_embed(texts):
+        calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    cache = EmbeddingCache(max_size=10)
+    cache.get_or_compute(["alpha", "beta"], fake_embed)
+    embeddings = cache.get_or_compute(["beta", "gamma"], fake_embed)
+    assert embeddings == [[4.0], [5.0]] and calls == [["alpha", "beta"], ["gamma"]], f"Unexpected embed calls {calls}"
+    print("OK: Only cache misses embedded")
+
+    # Saves from several threads must not trip over each other's tmp file
+    persisted = EmbeddingCache(persist_path="data/test_embedding_cache.pkl")
+    def put_and_save(worker):
+        for i in range(10):
+            persisted.put(f"{worker}-{i}", [float(i)])
+            persisted.save()
+    await asyncio.gather(*(asyncio.to_thread(put_and_save, w) for w in range(4)))
+    assert len(EmbeddingCache(persist_path="data/test_embedding_cache.pkl")._entries) == 40, "Concurrent saves lost entries"
+    print("OK: Concurrent saves")
+    os.remove("data/test_embedding_cache.pkl")
+
+    # Several facts in one update_memory call are stored in one batch
+    print("\n[PermanentMemory]")
+    from modules import permanent_memory
+    class FakeVectorMemory:
+        enabled = True
+        def __init__(self):
+            self.batches = []
+        def add(self, text):
+            self.batches.append([text])
+            return "Fact stored"
+        def add_many(self, texts):
+            self.batches.append(texts)
+            return f"{len(texts)} facts stored"
+    fake = FakeVectorMemory()
+    original = permanent_memory.memory_instance
+    permanent_memory.memory_instance = fake
+    try:
+        await permanent_memory.update_memory("- Lives in Irkutsk\n- Prefers tea\n")
+        await permanent_memory.update_memory("Birthday is in May")
+    finally:
+        permanent_memory.memory_instance = original
+    assert fake.batches == [["Lives in Irkutsk", "Prefers tea"], ["Birthday is in May"]], fake.batches
+    print("OK: Facts stored in one batch")
+
+    # 4. UI Manager (Import check only as it requires a bot instance)
     print("\n[TelegramUIManager]")
     try:
         from core.ui.telegram_ui import TelegramUIManager
@@ -54,5 +152,30 @@ async def test_components():
     except ImportError as e:
         print(f"FAIL: Import failed {e}")
 
+    # 5. Rate limiter: a burst beyond capacity waits for refills, other keys are independent
+    print("\n[AsyncTokenBucket]")
+    from core.ui.ratelimit import AsyncTokenBucket
+    bucket = AsyncTokenBucket(rate=20, capacity=2)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for _ in range(4):
+        await bucket.acquire("chat")
+    await bucket.acquire("other")
+    elapsed = loop.time() - start
+    assert 0.08 <= elapsed < 0.5, f"Unexpected pacing {elapsed:.2f}s"
+    print("OK: Burst paced")
+
+    # A waiter cancelled before sending gives its token back
+    bucket = AsyncTokenBucket(rate=2, capacity=1)
+    await bucket.acquire("chat")
+    waiter = asyncio.create_task(bucket.acquire("chat"))
+    await asyncio.sleep(0.05)
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    start = loop.time()
+    await bucket.acquire("chat")
+    assert loop.time() - start < 0.6, "Cancelled wait kept its token"
+    print("OK: Cancelled wait refunded")
+
 if __name__ == "__main__":
     asyncio.run(test_components())
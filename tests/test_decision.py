@@ -1,7 +1,4 @@
 import asyncio
-import sys
-import os
-sys.path.append(os.getcwd())
 
 from core.task_graph import TaskGraph, Task, TaskStatus
 from core.decision import DecisionLayer
@@ -57,5 +54,42 @@ async def test_decision_layer():
     else:
         print("FAIL: Decision parsing failed")
 
+    # Repeating the request must be answered from the decision cache
+    async def no_llm(*args, **kwargs):
+        raise AssertionError("LLM called for a cached decision")
+    llm.generate = no_llm
+    cached = await decision_layer.decide(
+        "what time is  it?",
+        [],
+        [{"function": {"name": "get_current_time"}}]
+    )
+    assert cached == result, "Decision cache miss"
+    print("OK: Decision cache hit")
+
+    # The same words after a different conversation are decided again
+    calls = []
+    async def counting_generate(*args, **kwargs):
+        calls.append(args)
+        return await MockLLM().generate(*args, **kwargs)
+    llm.generate = counting_generate
+    await decision_layer.decide(
+        "What time is it?",
+        [{"role": "assistant", "content": "Which city?"}],
+        [{"function": {"name": "get_current_time"}}]
+    )
+    assert len(calls) == 1, "Cached decision reused in another context"
+    print("OK: Decision cache keyed by history")
+
+    # Trivial messages are classified without the LLM
+    names = {"get_current_time"}
+    greeting = decision_layer.fast_classify("Привет!", names)
+    time_question = decision_layer.fast_classify("What time is it?", names)
+    other = decision_layer.fast_classify("Hi, find me a flight to Irkutsk", names)
+    confirmation = decision_layer.fast_classify("ok", names)
+    assert greeting and greeting["decision"] == "RESPOND_DIRECTLY", greeting
+    assert time_question and time_question["tool_name"] == "get_current_time", time_question
+    assert other is None and confirmation is None, "Fast path taken for a non-trivial message"
+    print("OK: Fast classification works")
+
 if __name__ == "__main__":
     asyncio.run(test_decision_layer())
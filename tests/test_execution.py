@@ -1,7 +1,4 @@
 import asyncio
-import sys
-import os
-sys.path.append(os.getcwd())
 
 from core.planner import Planner
 from core.executor import Executor
@@ -9,10 +6,18 @@ from core.module_manager import ModuleManager
 from core.task_graph import TaskGraph, Task
 
 # Mock LLM for Planner
+PLAN_JSON = '[\n  {\n    "id": "1",\n    "tool": "get_current_time",\n    "args": {},\n    "dependencies": []\n  }\n]'
+
 class MockLLM:
     async def generate(self, messages, provider="deepseek", stream=False):
+        if stream:
+            # Deltas split mid-object, as a real stream would
+            async def gen():
+                for i in range(0, len(PLAN_JSON), 5):
+                    yield PLAN_JSON[i:i + 5]
+            return gen()
         class Message:
-            content = '[\n  {\n    "id": "1",\n    "tool": "get_current_time",\n    "args": {},\n    "dependencies": []\n  }\n]'
+            content = PLAN_JSON
         return Message()
 
 async def test_execution():
@@ -36,6 +41,11 @@ async def test_execution():
     else:
         print(f"FAIL: Plan generation failed, tasks={len(graph.tasks)}")
 
+    # The system prompt is serialized once per definitions list
+    first = planner._build_messages("a", [], tools)[0]["content"]
+    assert planner._build_messages("b", [], tools)[0]["content"] is first, "Planner prompt rebuilt"
+    print("OK: Planner prompt cached")
+
     # 2. Test Executor
     print("\n[Executor]")
     # We use the generated graph
@@ -47,5 +57,14 @@ async def test_execution():
     else:
         print("FAIL: Execution failed")
 
+    # 3. Streamed plan: tasks are executed as the planner emits them
+    print("\n[Streamed plan]")
+    streamed = TaskGraph()
+    tasks = planner.stream_plan("What time is it?", [], tools)
+    result = await executor.execute_graph(streamed, incoming=tasks)
+    assert len(streamed.tasks) == 1, f"Streamed plan has {len(streamed.tasks)} tasks"
+    assert "Error" not in str(result) and ":" in str(result), f"Streamed plan failed: {result}"
+    print("OK: Streamed plan executed")
+
 if __name__ == "__main__":
     asyncio.run(test_execution())
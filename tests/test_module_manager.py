@@ -1,9 +1,5 @@
-import sys
-import os
 import asyncio
-
-# Add project root to path
-sys.path.append(os.getcwd())
+import sys
 
 from core.module_manager import ModuleManager
 
@@ -29,9 +25,7 @@ async def test_manager():
 
     # Execute a tool
     print("\nExecuting get_current_time...")
-    result = await manager.execute("get_current_time")
-    if asyncio.iscoroutine(result):
-        result = await result
+    result = manager.execute("get_current_time")
     print("Result:", result)
 
     if "Error" in str(result):
@@ -39,6 +33,15 @@ async def test_manager():
     else:
          print("OK: Tool executed successfully")
 
+    # execute_async awaits coroutine tools and passes plain results through
+    result = await manager.execute_async("get_current_time")
+    assert isinstance(result, str) and "Error" not in result, f"execute_async returned {result!r}"
+    print("OK: execute_async returned a result")
+
+    missing = await manager.execute_async("no_such_tool")
+    assert missing == "Error: Tool 'no_such_tool' not found.", "execute_async error mismatch"
+    print("OK: execute_async passes errors through")
+
     # Check definitions
     print("\nChecking definitions...")
     defs = manager.get_definitions()
@@ -48,5 +51,30 @@ async def test_manager():
     else:
         print("FAIL: Not enough definitions")
 
+    # Definitions are cached until a tool is registered
+    assert manager.get_definitions() is defs, "Definitions rebuilt without changes"
+    print("OK: Definitions cached")
+
+    manager.register_tool("echo_test", lambda text: text, "Echo")
+    assert any(d["function"]["name"] == "echo_test" for d in manager.get_definitions()), "New tool missing from definitions"
+    print("OK: Definitions refreshed after registration")
+
+    # Arguments the tool doesn't take are dropped
+    result = manager.execute("echo_test", text="hi", reasoning="invented by the LLM")
+    assert result == "hi", f"Unknown arguments passed through {result!r}"
+    print("OK: Unknown arguments ignored")
+
+    # Shared sessions held by modules are closed at shutdown
+    class FakeSession:
+        closed = False
+        async def close(self):
+            self.closed = True
+    session = FakeSession()
+    datetime_tools = sys.modules["modules.datetime"]
+    datetime_tools._weather_session = session
+    await manager.close()
+    assert session.closed and datetime_tools._weather_session is None, "Weather session left open"
+    print("OK: Module sessions closed")
+
 if __name__ == "__main__":
     asyncio.run(test_manager())